@@ -1,16 +1,65 @@
-from argparse import ArgumentParser, FileType
+from argparse import ArgumentParser, ArgumentTypeError, FileType
 from importlib import util as importer
 from pathlib import Path
 
-from .convert import bdf2ttf
+from .convert import bdf2ttf, tracers
+from .cache import FontCache, GlyphCache
+
+
+def coderanges(s):
+    ranges = []
+    for r in s.split(','):
+        c0, _, c1 = r.strip().removeprefix('U+').partition('-')
+        ranges.append((int(c0, 16), int(c1.removeprefix('U+') or c0, 16)))
+    return ranges
+
+
+def jobcount(s):
+    if (n := int(s)) < 1:
+        raise ArgumentTypeError('need at least 1 job')
+    return n
+
+
+def ppemlist(s):
+    ppems = { int(p) for p in s.split(',') if p.strip() }
+    if not all(1 <= p <= 255 for p in ppems):
+        raise ArgumentTypeError('ppems must be 1-255')
+    return sorted(ppems)
 
 
 parser = ArgumentParser('bdf2ttf',
-    description='convert BDF bitmap font into simple TrueType outlines')
+    description='convert BDF or PCF bitmap font into simple TrueType outlines')
 parser.add_argument('--mod', type=Path, metavar='MOD.py',
     help='python code to apply changes to font after loading')
-parser.add_argument('bdf', type=FileType(), metavar='font.bdf',
-    help='BDF font file to convert')
+parser.add_argument('--ranges', type=coderanges, metavar='XXXX-XXXX,...',
+    help='only convert characters in these (hex) code point ranges')
+parser.add_argument('--tracer', choices=tracers, default='bits',
+    help='how to find the pixel corners to trace (default %(default)s)')
+parser.add_argument('--composite', action='store_true',
+    help='write glyphs made of copies of other glyphs as composites')
+parser.add_argument('--merge', action='store_true',
+    help='map chars with identical bitmaps to a single glyph')
+parser.add_argument('--no-bitmaps', dest='bitmaps', action='store_false',
+    help="don't embed the original bitmaps as a strike at their size")
+parser.add_argument('--compact', action='store_true',
+    help='use the smallest em whose chamfers still render pixel-perfect'
+         ' up to the largest of --ppems, for a smaller glyf')
+parser.add_argument('--ppems', type=ppemlist, metavar='N,...',
+    help='sizes to precompute device metrics (hdmx, LTSH, VDMX) for,'
+         ' empty for none (default 1-4 times the pixel size)')
+parser.add_argument('-f', '--format', action='append',
+    choices=('ttf', 'woff'), metavar='{ttf,woff}',
+    help='output font format, may be repeated (default ttf)')
+parser.add_argument('-j', '--jobs', type=jobcount, default=1, metavar='N',
+    help='number of processes to use for parsing and vectorizing')
+parser.add_argument('--cache-dir', type=Path, metavar='DIR',
+    help='where to keep parsed fonts and glyphs (default ~/.cache/bdf2ttf)')
+parser.add_argument('--no-cache', action='store_true',
+    help='always parse and trace the font, bypassing the caches')
+parser.add_argument('--clear-cache', action='store_true',
+    help='remove all cached fonts and glyphs before converting')
+parser.add_argument('bdf', type=FileType('rb'), metavar='font.bdf',
+    help='BDF or PCF font file (optionally gzipped) to convert')
 
 args = parser.parse_args()
 
@@ -22,4 +71,16 @@ if modpath := args.mod:
 else:
     mod = None
 
-bdf2ttf(args.bdf, mod)
+cache = FontCache(args.cache_dir)
+glyph_cache = GlyphCache(args.cache_dir)
+if args.clear_cache:
+    cache.clear()
+    glyph_cache.clear()
+if args.no_cache:
+    cache = glyph_cache = None
+
+bdf2ttf(args.bdf, mod,
+        jobs=args.jobs, cache=cache, ranges=args.ranges, tracer=args.tracer,
+        glyph_cache=glyph_cache, composite=args.composite, merge=args.merge,
+        formats=args.format or ('ttf',), bitmaps=args.bitmaps,
+        ppems=args.ppems, compact=args.compact)
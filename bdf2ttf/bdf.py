@@ -1,6 +1,11 @@
 from math import ceil
+from mmap import mmap, ACCESS_READ
+from binascii import unhexlify
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import re
 
-from .font import Font, Glyph
+from .font import Font, Glyph, Bitmap
 
 
 def _intlist(s):
@@ -14,6 +19,9 @@ def _none(s):
 
 
 class BDFReader:
+    # bump when parsing changes the resulting Font (invalidates caches)
+    version = 1
+
     handlers = {
         'STARTFONT': float,
         'ENDFONT': _none,
@@ -31,20 +39,40 @@ class BDFReader:
         'BBX': _intlist,
     }
 
-    def __init__(self, bdf=None):
+    def __init__(self, bdf=None, ranges=None):
         self.props = {}
         self.info = {
             'PROPERTIES': self.props,
         }
-        self.chars = []
+        self.bitmaps = None
+        self.ranges = ranges  # [ (first, last), ... ] codes to keep
 
         if bdf is not None:
             self.read(bdf)
 
     def read(self, bdf):
+        # all bitmaps packed in one buffer, which the font keeps
+        return self._grok_font(self.stream(bdf, bytearray()))
+
+    def stream(self, bdf, bitmaps=None):
+        # parse header and properties now, but glyphs only on demand, so
+        # each is dropped after conversion and memory is bounded by one char.
+        # that includes its bitmap, unless a buffer to pack them in is given
+        self.bitmaps = bitmaps
         self._iter = iter(bdf)
-        self._parse_file()
-        return self._grok_font()
+        first = self._parse_header()
+        self._grok_scale()
+        return self._stream_chars(first)
+
+    @staticmethod
+    def map(bdf):
+        if isinstance(bdf, (bytes, bytearray, memoryview, mmap)):
+            return bdf
+        try:
+            return mmap(bdf.fileno(), 0, access=ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            data = bdf.read()
+            return data.encode() if isinstance(data, str) else data
 
     def __iter__(self):
         return self
@@ -62,16 +90,30 @@ class BDFReader:
                 assert kv[1] == kv[1].strip()
             return kv
 
-    def _parse_file(self):
+    def _parse_header(self):
         for k, v in self:
             match k:
                 case 'STARTCHAR':
-                    self._parse_char(v)
+                    return v
                 case 'STARTPROPERTIES':
                     self._parse_props()
                 case _:
                     self._parse_kvp(self.info, k, v)
 
+    def _stream_chars(self, name):
+        if name is None:
+            return
+        if ch := self._parse_char(name):
+            yield self._grok_char(ch)
+
+        for k, v in self:
+            match k:
+                case 'STARTCHAR':
+                    if ch := self._parse_char(v):
+                        yield self._grok_char(ch)
+                case _:
+                    self._parse_kvp(self.info, k, v)
+
     def _parse_props(self):
         for k, v in self:
             if k == 'ENDPROPERTIES':
@@ -83,24 +125,30 @@ class BDFReader:
         ch = {
             'CHAR': name,
         }
-        self.chars.append(ch)
 
         for k, v in self:
             match k:
                 case 'BITMAP':
                     self._parse_bitmap(ch)
                 case 'ENDCHAR':
-                    return
+                    return ch
+                case 'ENCODING' if not self.wanted(int(v)):
+                    for k, v in self:
+                        if k == 'ENDCHAR':
+                            return None
                 case _:
                     self._parse_kvp(ch, k, v)
 
     def _parse_bitmap(self, ch):
+        # rows are hex padded to whole bytes;  cut or zero-fill any that
+        # are padded differently
         w, h = ch['BBX'][0:2]
-        s = ((w + 7) >> 3 << 3) - w
+        n = 2 * ((w + 7) >> 3)
+        s = 4*n - w
         bmp = ch['BITMAP'] = []
         for i in range(h):
             v, _ = next(self)
-            bmp.append(int(v, base=16) >> s)
+            bmp.append(int(v[:n].ljust(n, '0'), base=16) >> s)
 
     def _parse_kvp(self, ctx, k, v):
         if h := self.handlers.get(k):
@@ -117,8 +165,9 @@ class BDFReader:
                 else:
                     ctx[k] = v
 
-    def _grok_font(self):
+    def _grok_font(self, glyphs):
         font = Font()
+        font.bitmaps = self.bitmaps
 
         props = self.props
         font.copyright = props.get('COPYRIGHT', '')
@@ -129,7 +178,7 @@ class BDFReader:
         font.caret = [0, 0]
 
         self._grok_metrics(font)
-        self._grok_chars(font)
+        self._grok_chars(font, glyphs)
         self._grok_style(font)
 
         return font
@@ -167,28 +216,126 @@ class BDFReader:
         else:
             font.fixedpitch = int(ceil(fixed[0]))
 
-    def _grok_chars(self, font):
+    def _grok_scale(self):
         info = self.info
-        gadv = info.get('SWIDTH', (None, None))
         size = info['SIZE']
-        sx = size[0] * size[1] / 72
-        sy = size[0] * size[2] / 72
-        default = self.props.get('DEFAULT_CHAR', 0)
-        glyphs = font.glyphs
-
-        for ch in self.chars:
-            code, name = ch['ENCODING'], ch['CHAR']
-            if code == default:
-                key, code, name = Glyph.NOTDEF, Glyph.NOTDEF, '.notdef'
-            else:
-                key = chr(code)
-            assert key not in glyphs
-            glyph = glyphs[key] = Glyph(code, name)
+        self._gadv = info.get('SWIDTH', (None, None))
+        self._sx = size[0] * size[1] / 72
+        self._default = self.props.get('DEFAULT_CHAR', 0)
+        # never filter out glyphs that clean_glyphs requires
+        self._always = { self._default, ord(Glyph.NULL), ord(Glyph.SPACE) }
+
+    def wanted(self, code):
+        return not self.ranges \
+            or code in self._always \
+            or any(c0 <= code <= c1 for c0, c1 in self.ranges)
+
+    def _grok_chars(self, font, glyphs):
+        fglyphs = font.glyphs
+        for glyph in glyphs:
+            key = chr(glyph.code) if glyph.code >= 0 else glyph.code
+            assert key not in fglyphs
+            fglyphs[key] = glyph
+
+    def _grok_char(self, ch):
+        code, name = ch['ENCODING'], ch['CHAR']
+        if code == self._default:
+            code, name = Glyph.NOTDEF, '.notdef'
+        glyph = Glyph(code, name)
+
+        bbx = ch['BBX']
+        glyph.bbox = [ bbx[2], bbx[3], bbx[0]+bbx[2], bbx[1]+bbx[3] ]
+
+        adv = ch.get('SWIDTH', self._gadv)
+        assert adv[1] == 0
+        glyph.advance = adv[0] * self._sx / 1000
+
+        bits = ch['BITMAP']
+        if isinstance(bits, list):
+            glyph.bitmap = Bitmap.pack(bits, bbx[0], self.bitmaps)
+        else:
+            glyph.bitmap = Bitmap.frombytes(bits, *bbx[0:2], self.bitmaps)
+        return glyph
+
+
+class BDFBytesReader(BDFReader):
+    # fast path:  scan the whole file as bytes, finding char blocks with one
+    # regex and decoding all hex rows of a bitmap at once
+    charpat = re.compile(
+        rb'^STARTCHAR[ \t]+(.*?)[ \t]*\r?$(.*?)^BITMAP[ \t]*\r?$(.*?)^ENDCHAR',
+        re.M | re.S)
+    startpat = re.compile(rb'^STARTCHAR', re.M)
+
+    def __init__(self, bdf=None, ranges=None, jobs=1):
+        self.jobs = jobs
+        super().__init__(bdf, ranges)
+
+    def stream(self, bdf, bitmaps=None):
+        self.bitmaps = bitmaps
+        data = self.map(bdf)
+        end = m.start() if (m := self.startpat.search(data)) else len(data)
+        self._iter = iter(bytes(data[:end]).decode().splitlines())
+        assert self._parse_header() is None
+        self._grok_scale()
+        if self.jobs > 1:
+            return self._stream_chunks(data, end)
+        return self._stream_chars(data, end)
+
+    def _stream_chars(self, data, pos):
+        for m in self.charpat.finditer(data, pos):
+            if ch := self._parse_char(*m.groups()):
+                yield self._grok_char(ch)
+
+    def _stream_chunks(self, data, pos):
+        # chars are independent, so split at STARTCHAR boundaries and parse
+        # chunks in parallel;  results come back in order and are only
+        # converted to glyphs here, so they share the bitmap buffer
+        filt = self.ranges, self._always
+        with ProcessPoolExecutor(self.jobs) as pool:
+            for chars in pool.map(_parse_chunk, self._split(data, pos),
+                                  repeat(filt)):
+                for ch in chars:
+                    yield self._grok_char(ch)
+
+    def _split(self, data, pos):
+        end = len(data)
+        step = max(1, (end - pos) // self.jobs)
+        while pos < end:
+            m = self.startpat.search(data, pos + step)
+            cut = m.start() if m else end
+            yield bytes(data[pos:cut])
+            pos = cut
+
+    def _parse_char(self, name, info, rows):
+        ch = {
+            'CHAR': name.decode(),
+        }
 
-            bbx = ch['BBX']
-            glyph.bbox = [ bbx[2], bbx[3], bbx[0]+bbx[2], bbx[1]+bbx[3] ]
+        handlers = self.handlers
+        for line in info.splitlines():
+            kv = line.split(maxsplit=1)
+            if len(kv) == 2 and (h := handlers.get(k := kv[0].decode())):
+                if (p := h(kv[1])) is not None:
+                    ch[k] = p
+
+        # skip unwanted glyphs before decoding any bitmap
+        if not self.wanted(ch['ENCODING']):
+            return None
 
-            adv = ch.get('SWIDTH', gadv)
-            assert adv[1] == 0
-            glyph.advance = adv[0] * sx / 1000
-            glyph.bitmap = ch['BITMAP']
+        w, h = ch['BBX'][0:2]
+        n = 2 * ((w + 7) >> 3)
+        digits = rows.translate(None, b' \t\r\n')
+        if len(digits) != h*n or len(rows.split()) != h:
+            # irregular row padding, cut or zero-fill each row to its bytes
+            digits = b''.join(v[:n].ljust(n, b'0') for v in rows.split()[:h])
+        ch['BITMAP'] = unhexlify(digits)
+        return ch
+
+
+def _parse_chunk(data, filt):
+    reader = BDFBytesReader()
+    reader.ranges, reader._always = filt
+    return [
+        ch for m in reader.charpat.finditer(data)
+        if (ch := reader._parse_char(*m.groups()))
+    ]
@@ -0,0 +1,143 @@
+from hashlib import sha256
+from pathlib import Path
+from time import time
+import os
+import pickle
+import zlib
+
+
+def default_path():
+    home = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(home) / 'bdf2ttf'
+
+
+class FontCache:
+    # parsed fonts saved as compressed pickles, keyed by a hash of the
+    # source bytes and the reader version, so any change to either misses.
+    # least recently used entries are evicted to stay under maxsize bytes
+    suffix = '.font'
+
+    def __init__(self, path=None, maxsize=64<<20):
+        self.path = Path(path or default_path())
+        self.maxsize = maxsize
+
+    def key(self, data, version):
+        h = sha256(f'{version}\n'.encode())
+        h.update(data)
+        return h.hexdigest()
+
+    def load(self, key):
+        path = self.path / (key + self.suffix)
+        try:
+            font = pickle.loads(zlib.decompress(path.read_bytes()))
+        except FileNotFoundError:
+            return None
+        except Exception as ex:
+            print(f'cache: dropping bad entry {path.name}: {ex}')
+            path.unlink(missing_ok=True)
+            return None
+
+        path.touch()  # mark recently used
+        print(f'cache: loaded {path}')
+        return font
+
+    def store(self, key, font):
+        self.path.mkdir(parents=True, exist_ok=True)
+        path = self.path / (key + self.suffix)
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}')
+        tmp.write_bytes(zlib.compress(pickle.dumps(font, protocol=5)))
+        tmp.replace(path)
+        print(f'cache: saved {path} ({path.stat().st_size} bytes)')
+        self.evict()
+
+    def entries(self):
+        # oldest first
+        if not self.path.is_dir():
+            return []
+        return sorted(
+            ((p.stat(), p) for p in self.path.glob('*' + self.suffix)),
+            key=lambda e: e[0].st_mtime
+        )
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(st.st_size for st, _ in entries)
+        for st, path in entries:
+            if total <= self.maxsize:
+                break
+            print(f'cache: evicting {path.name}')
+            path.unlink(missing_ok=True)
+            total -= st.st_size
+
+    def clear(self):
+        for _, path in self.entries():
+            path.unlink(missing_ok=True)
+
+
+class GlyphCache:
+    # traced and scaled outlines of individual glyphs, with their glyf
+    # records, keyed by everything that goes into them, so rebuilds after
+    # small changes to a font only redo the glyphs that actually changed.
+    # all entries share one compressed pickle;  least recently used ones
+    # are evicted to stay under maxcount
+    name = 'glyphs.cache'
+    version = 2
+
+    def __init__(self, path=None, maxcount=1<<15):
+        self.path = Path(path or default_path())
+        self.maxcount = maxcount
+        self.entries = None
+        self.used = {}
+
+    def _read(self):
+        file = self.path / self.name
+        try:
+            version, entries = pickle.loads(zlib.decompress(file.read_bytes()))
+        except FileNotFoundError:
+            return {}
+        except Exception as ex:
+            print(f'cache: dropping bad glyph cache: {ex}')
+            return {}
+        return entries if version == self.version else {}
+
+    def get(self, key, glyph):
+        # fill in glyph if cached;  either way it is saved (again) later
+        if self.entries is None:
+            self.entries = self._read()
+        self.used[key] = glyph
+        if not (entry := self.entries.get(key)):
+            return False
+        _, glyph.advance, glyph.contours, glyph.glyf = entry
+        return True
+
+    def save(self):
+        if not self.used:
+            return
+        now = time()
+        # merge with whatever other builds saved in the meantime
+        entries = self._read()
+        entries.update(
+            (key, (now, g.advance, g.contours, getattr(g, 'glyf', None)))
+            for key, g in self.used.items()
+        )
+
+        evicted = len(entries) - self.maxcount
+        if evicted > 0:
+            stale = sorted(entries, key=lambda k: entries[k][0])[:evicted]
+            for key in stale:
+                del entries[key]
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        file = self.path / self.name
+        tmp = file.with_name(f'.{file.name}.{os.getpid()}')
+        tmp.write_bytes(zlib.compress(
+            pickle.dumps((self.version, entries), protocol=5)))
+        tmp.replace(file)
+        print(f'cache: saved {len(entries)} glyphs to {file}'
+              f' ({max(evicted, 0)} evicted)')
+        self.entries = entries
+        self.used = {}
+
+    def clear(self):
+        (self.path / self.name).unlink(missing_ok=True)
+        self.entries = None
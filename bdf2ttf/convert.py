@@ -1,45 +1,119 @@
 from math import floor
+from io import TextIOBase
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import repeat
+import gzip
 import unicodedata
 
-from .font import Font, Glyph
-from .bdf import BDFReader
+from .font import Font, Glyph, Bitmap
+from .bdf import BDFReader, BDFBytesReader
+from .pcf import PCFReader
 from .ttf import TTFWriter
+from .woff import WOFFWriter
 
 
-def bdf2ttf(bdf, mod=None):
-    font = BDFReader().read(bdf)
+def bdf2ttf(bdf, mod=None, *, jobs=1, cache=None, ranges=None,
+            tracer='bits', glyph_cache=None, composite=False, merge=False,
+            formats=('ttf',), bitmaps=True, ppems=None, compact=False):
+    font = read_font(bdf, jobs, cache, ranges)
     print(font)
 
     if mod and (apply := mod.apply_bitmaps):
         apply(font)
 
+    # device metrics default to 1-4 times the pixel size
+    ppem = font.size
+    if ppems is None:
+        ppems = [ ppem*i for i in range(1, 5) ]
+
     # make big grid so chamfers disappear
     maxupm = 1<<13
     scale = maxupm // font.size
+    if compact:
+        # or the smallest one where chamfers (of one unit) stay under half
+        # a device pixel up to the largest ppem, so they still don't touch
+        # any pixel centres there, but most glyf deltas fit in a byte.
+        # unitsPerEm can't be less than 16
+        scale = max(floor(2 * max(ppems, default=ppem) / font.size) + 1,
+                    -(-16 // font.size))
 
-    for ch, glyph in font.glyphs.items():
-        code = ord(ch) if isinstance(ch, str) else ch
-        if glyph.code == code:
-            vectorize_glyph(glyph, scale)
+    outline_font(font, scale, tracer, jobs, glyph_cache)
 
     clean_glyphs(font)
 
+    if merge:
+        merge_glyphs(font)
+
     scale_font(font, scale)
 
+    # the bitmaps are also embedded as a strike at their own size
     font.bbox = font.calc_bbox()
-    ttf = TTFWriter(font)
-    ttf.head.lowestRecPPEM = font.size // scale
+    ttf = TTFWriter(font, composite, ppem if bitmaps else None, ppems)
+    ttf.head.lowestRecPPEM = ppem
 
     # A font's filename must be composed as "<familyname>-<stylename>.ttf"
     # [aka, the postscript name]
-    with open(f'{ttf.name.psname}.ttf', 'wb+') as out:
-        ttf.write(out)
+    sfnt = ttf.assemble()
+    if 'ttf' in formats:
+        with open(f'{ttf.name.psname}.ttf', 'wb') as out:
+            out.write(sfnt)
+    if 'woff' in formats:
+        with open(f'{ttf.name.psname}.woff', 'wb') as out:
+            WOFFWriter(ttf).write(out, sfnt)
+
+    if glyph_cache:
+        glyph_cache.save()
 
     # also make "proof sheet" of all characters in font
     with open(f'{ttf.name.psname} chars.txt', 'w') as out:
         dump_chars(font, out)
 
 
+def read_font(bdf, jobs=1, cache=None, ranges=None):
+    # text files go through the line parser, binary ones are sniffed for
+    # compression and PCF, otherwise take the BDF fast path
+    if isinstance(bdf, TextIOBase):
+        return BDFReader(ranges=ranges).read(bdf)
+
+    data = BDFReader.map(bdf)
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+    if data[:4] == PCFReader.magic:
+        reader = PCFReader(ranges=ranges)
+    else:
+        reader = BDFBytesReader(ranges=ranges, jobs=jobs)
+    if not cache:
+        return reader.read(data)
+
+    key = cache.key(data,
+        f'{type(reader).__name__} {reader.version} {reader.ranges}')
+    if not (font := cache.load(key)):
+        font = reader.read(data)
+        cache.store(key, font)
+    return font
+
+
+def merge_glyphs(font):
+    # map all chars that look the same (eg A/Α/А) to one glyph, the same
+    # way clean_glyphs maps empty ones to space.  same bitmap and advance
+    # trace to the same outline, so that's what is compared
+    glyphs = font.glyphs
+    shapes = {}
+    merged = 0
+    for ch in sorted(glyphs, key=lambda c: ord(c) if isinstance(c, str) else c):
+        glyph = glyphs[ch]
+        code = ord(ch) if isinstance(ch, str) else ch
+        if glyph.code != code or not glyph.contours or code <= 0:
+            continue
+        key = (glyph.advance, *(tuple(map(tuple, c)) for c in glyph.contours))
+        if (same := shapes.setdefault(key, glyph)) is not glyph:
+            glyphs[ch] = same
+            merged += 1
+    print(f'merge: {merged} glyphs merged into {len(shapes)}')
+
+
 def clean_glyphs(font):
     glyphs = font.glyphs
 
@@ -114,9 +188,10 @@ def scale_font(font, scale):
         font.fixedpitch *= scale
     font.size *= scale
 
+    # glyphs with bitmaps were already scaled along with their outlines
     for ch, glyph in font.glyphs.items():
         code = ord(ch) if isinstance(ch, str) else ch
-        if glyph.code == code:
+        if glyph.code == code and not glyph.bitmap:
             scale_glyph(glyph, scale)
 
 
@@ -128,29 +203,445 @@ def scale_glyph(glyph, scale):
                 c[i] = [ round(p[0]*scale), round(p[1]*scale) ]
 
 
-def vectorize_glyph(glyph, scale):
+def outline_font(font, scale, tracer='bits', jobs=1, cache=None):
+    # vectorize and scale all glyphs with bitmaps.  vectorizing is pure, so
+    # only trace each distinct shape once (if not cached from a previous
+    # build) and copy the result to any other glyphs that look the same
+    shapes = {}
+    for ch, glyph in font.glyphs.items():
+        code = ord(ch) if isinstance(ch, str) else ch
+        if glyph.code == code and glyph.bitmap:
+            shapes.setdefault(shape_key(glyph), []).append(glyph)
+            set_sbit(glyph)
+    glyphs = []
+    for key, (glyph, *_) in shapes.items():
+        if cache and cache.get((*key, scale), glyph):
+            del glyph.bbox
+        else:
+            glyphs.append(glyph)
+    if cache:
+        print(f'glyph cache: {len(shapes) - len(glyphs)} cached,'
+              f' {len(glyphs)} rebuilt')
+
+    if jobs > 1:
+        outline_parallel(glyphs, scale, tracer, jobs)
+    else:
+        tracers[tracer](glyphs, scale)
+        for glyph in glyphs:
+            scale_glyph(glyph, scale)
+
+    hits = 0
+    for glyph, *same in shapes.values():
+        for other in same:
+            del other.bbox
+            other.advance = glyph.advance
+            other.contours = [
+                [ list(p) for p in ctr ]
+                for ctr in glyph.contours
+            ]
+            if hasattr(glyph, 'glyf'):
+                other.glyf = glyph.glyf
+        hits += len(same)
+    print(f'vectorize: {len(shapes)} shapes, {hits} reused')
+
+
+def set_sbit(glyph):
+    # keep the pixel placement (left, top, advance) for the bitmap strike,
+    # before bbox goes away.  combining marks move the same as their outlines
+    x0, y0, x1, y1 = glyph.bbox
+    adv = round(glyph.advance)
+    if category := glyph.combining():
+        x0 -= adv
+        if category != 'Mc':
+            adv = 0
+    glyph.sbit = (x0, y1, adv)
+
+
+def outline_parallel(glyphs, scale, tracer, jobs):
+    # ship a few chunks per process, so the stragglers even out
+    step = max(1, -(-len(glyphs) // (4*jobs)))
+    chunks = [ glyphs[i : i+step] for i in range(0, len(glyphs), step) ]
+    with ProcessPoolExecutor(jobs) as pool:
+        outlines = pool.map(_outline_chunk, map(pack_shapes, chunks),
+                            repeat((scale, tracer)))
+        for chunk, packed in zip(chunks, outlines):
+            unpack_outlines(chunk, packed)
+
+
+def pack_shapes(glyphs):
+    # just what vectorizing needs, and the bitmaps as one bytes object
+    return (
+        [ (g.code, g.bitmap.width, g.bitmap.height, *g.bbox, g.advance)
+          for g in glyphs ],
+        b''.join(bytes(g.bitmap) for g in glyphs),
+    )
+
+
+def _outline_chunk(shapes, params):
+    info, bits = shapes
+    scale, tracer = params
+    glyphs = []
+    off = 0
+    for code, w, h, x0, y0, x1, y1, adv in info:
+        glyph = Glyph(code)
+        size = h * (w+7 >> 3)
+        glyph.bitmap = Bitmap.frombytes(bits[off : off+size], w, h)
+        glyph.bbox = [ x0, y0, x1, y1 ]
+        glyph.advance = adv
+        glyphs.append(glyph)
+        off += size
+
+    tracers[tracer](glyphs, scale)
+
+    # scaled outlines are all ints, so flatten them into one array:
+    # advance, number of contours, their lengths, then all the points
+    out = array('i')
+    for glyph in glyphs:
+        scale_glyph(glyph, scale)
+        contours = glyph.contours
+        out.extend((glyph.advance, len(contours)))
+        out.extend(len(ctr) for ctr in contours)
+        for ctr in contours:
+            for p in ctr:
+                out.extend(p)
+    return out.tobytes()
+
+
+def unpack_outlines(glyphs, packed):
+    out = array('i')
+    out.frombytes(packed)
+    i = 0
+    for glyph in glyphs:
+        adv, n = out[i : i+2]
+        lens = out[i+2 : i+2+n]
+        i += 2+n
+        contours = []
+        for m in lens:
+            pts = out[i : i + 2*m]
+            contours.append([ [ x, y ] for x, y in zip(pts[::2], pts[1::2]) ])
+            i += 2*m
+        del glyph.bbox
+        glyph.advance = adv
+        glyph.contours = contours
+
+
+def shape_key(glyph):
+    # everything that determines the (unscaled) contours and advance
+    bmp = glyph.bitmap
+    return (
+        bytes(bmp), bmp.width, tuple(glyph.bbox), glyph.advance,
+        glyph.combining(),
+    )
+
+
+def vectorize_glyphs(glyphs, scale, corners=None):
+    for glyph in glyphs:
+        vectorize_glyph(glyph, scale, corners)
+
+
+def vectorize_glyph(glyph, scale, corners=None):
     if not glyph.bitmap:
         return
 
-    bmp = [ 0, *(d<<1 for d in glyph.bitmap), 0 ]
+    x0, y0, x1, y1 = glyph.bbox
+    n4, starts = (corners or find_corners)(glyph.bitmap, x1-x0, y1-y0)
+    place_contours(glyph, trace_corners(n4, starts, 1/scale))
 
-    nudge = 1/scale
+
+def place_contours(glyph, contours):
+    # convert traced corner coordinates to (unscaled) font coordinates
     x0, y0, x1, y1 = glyph.bbox
+    h = y1-y0
+    for ctr in contours:
+        for i, (x, y) in enumerate(ctr):
+            ctr[i] = [ x-1+x0, h-y+y0 ]
+
+    set_contours(glyph, contours)
+
+
+def set_contours(glyph, contours):
     del glyph.bbox
-    w, h = x1-x0, y1-y0
-    contours = glyph.contours = []
+    glyph.contours = contours
 
-    def get4n(x, y):
-        s = w+1 - x
-        return (bmp[y]>>s & 3)<<2 | (bmp[y+1]>>s & 3)
+    if category := glyph.combining():
+        # implement combining marks by hacking their position to overlay
+        # previous glyph and clearing their advance.  this "works" but
+        # it's hacky and generates some validation warnings...
+        # FIXME reimplement combining marks using GPOS?
+        adv = glyph.advance
+        for ctr in contours:
+            for p in ctr:
+                p[0] -= adv
 
-    corners = {
+        if category != 'Mc':
+            glyph.advance = 0
+        else:
+            # these are probably wrong (but we don't have any...)
+            print('FIXME: Mc:', glyph)
+
+
+def find_corners(bitmap, w, h):
+    # 4-neighbor code of each pixel corner (see cornerdirs),
+    # for y in 0..h and x in 0..w+1
+    bmp = [ 0, *(d<<1 for d in bitmap), 0 ]
+    n4 = [
+        [ (bmp[y]>>s & 3)<<2 | (bmp[y+1]>>s & 3) for s in range(w+1, -1, -1) ]
+        for y in range(h + 1)
+    ]
+
+    starts = {
         (x, y, *d): True	# sets suck
         for y in range(h + 1)
         for x in range(w + 1)
-        for d in cornerdirs.get(get4n(x, y), ())
+        for d in cornerdirs.get(n4[y][x], ())
+    }
+    return n4, starts
+
+
+def find_corners_numpy(bitmap, w, h):
+    # same as find_corners, but computes the codes for all corners at once
+    import numpy as np
+
+    px = np.zeros((h+2, w+3), np.uint8)
+    px[1:h+1, 2:w+2] = bitmap.pixels()
+    n4 = px[:-1, :-1]<<3 | px[:-1, 1:]<<2 | px[1:, :-1]<<1 | px[1:, 1:]
+
+    # nonzero() scans in row major order, same as the loops above
+    iscorner = np.array([ n in cornerdirs for n in range(16) ])
+    ys, xs = np.nonzero(iscorner[n4[:, :w+1]])
+    n4 = n4.tolist()
+    starts = {
+        (x, y, *d): True
+        for y, x in zip(ys.tolist(), xs.tolist())
+        for d in cornerdirs[n4[y][x]]
     }
+    return n4, starts
 
+
+def vectorize_atlas(glyphs, scale):
+    # find the corners of all glyphs at once:  stack the bitmaps of each
+    # size into one padded atlas, compute all corner codes, then, for every
+    # corner and incoming direction, the points to emit and which corner
+    # comes next.  tracing is then just following those links
+    import numpy as np
+
+    sizes = {}
+    for glyph in glyphs:
+        bmp = glyph.bitmap
+        sizes.setdefault((bmp.width, bmp.height), []).append(glyph)
+
+    # per corner code: number of incoming directions, the directions, kind
+    ndirs = np.array([ len(cornerdirs.get(n, ())) for n in range(16) ])
+    dirs = np.zeros((16, 2, 2), int)
+    for n, ds in cornerdirs.items():
+        dirs[n, :len(ds)] = ds
+    isinternal = np.isin(np.arange(16), internal)
+    isdiagonal = np.isin(np.arange(16), diagonal)
+
+    nudge = 1/scale
+    for (w, h), group in sizes.items():
+        n = len(group)
+        stride = (w + 7) >> 3
+        bits = np.frombuffer(b''.join(bytes(g.bitmap) for g in group), np.uint8)
+        px = np.zeros((n, h+2, w+3), np.uint8)
+        px[:, 1:h+1, 2:w+2] = np.unpackbits(
+            bits.reshape(n, h, stride), axis=2, count=w)
+        n4 = px[:, :-1, :-1]<<3 | px[:, :-1, 1:]<<2 \
+            | px[:, 1:, :-1]<<1 | px[:, 1:, 1:]
+
+        # corner cells in row major order.  a contour never ends between
+        # corners, so the next one along a row/column is just the next
+        # cell in row/column major order
+        gs, ys, xs = np.nonzero(ndirs[n4])
+        codes = n4[gs, ys, xs]
+        ncells = len(codes)
+        if ncells == 0:
+            # all blank, nothing to trace
+            for glyph in group:
+                set_contours(glyph, [])
+            continue
+        cells = np.arange(ncells)
+        bycol = np.lexsort((ys, xs, gs))
+        rank = np.empty_like(bycol)
+        rank[bycol] = cells
+        nbrs = {
+            R: np.minimum(cells + 1, ncells-1),
+            L: np.maximum(cells - 1, 0),
+            D: bycol[np.minimum(rank + 1, ncells-1)],
+            U: bycol[np.maximum(rank - 1, 0)],
+        }
+
+        # states are (corner, incoming direction), in cornerdirs order
+        nd = ndirs[codes]
+        first = np.cumsum(nd) - nd
+        cell = np.repeat(cells, nd)
+        k = np.arange(len(cell)) - first[cell]
+        c = codes[cell]
+        dx, dy = dirs[c, k, 0], dirs[c, k, 1]
+        inner = isinternal[c]
+        ox = np.where(inner, dy, -dy)
+        oy = np.where(inner, -dx, dx)
+        chamfer = isdiagonal[c] & (dx >= 0) & (dy <= 0)
+
+        nxt = np.zeros_like(cell)
+        for (odx, ody), nbr in nbrs.items():
+            sel = (ox == odx) & (oy == ody)
+            nc = nbr[cell[sel]]
+            cn = codes[nc]
+            second = (ndirs[cn] == 2) & (dirs[cn, 1, 0] == odx) \
+                & (dirs[cn, 1, 1] == ody)
+            nxt[sel] = first[nc] + second
+
+        # each contour is a cycle of nxt, traced from the last startable
+        # state (as popitem() in trace_corners would), so label each state
+        # with its cycle start and rank it by distance from there, jumping
+        # pointers in log(n) vectorized steps instead of walking in python
+        nstates = len(cell)
+        states = np.arange(nstates)
+        start = np.where(xs[cell] <= w, states, -1)
+        hop = nxt
+        while True:
+            follow = np.maximum(start, start[hop])
+            if (follow == start).all():
+                break
+            start, hop = follow, hop[hop]
+        isstart = start == states
+        assert not chamfer[isstart].any()
+
+        prev = np.empty_like(nxt)
+        prev[nxt] = states
+        prev[isstart] = states[isstart]
+        rank = (~isstart).astype(int)
+        while (prev != prev[prev]).any():
+            rank += rank[prev]
+            prev = prev[prev]
+
+        # the tracer stops when it gets back to the start position, which
+        # must not happen early through the other side of a diagonal
+        check = isstart & (nd[cell] == 2)
+        assert (start[(first[cell] + 1 - k)[check]] != states[check]).all()
+
+        g = gs[cell]
+        order = np.lexsort((rank, -start, g))
+
+        # emit one point per state, two where chamfered, already converted
+        # to font coordinates (see place_contours)
+        x0 = np.array([ glyph.bbox[0] for glyph in group ])[g]
+        y0 = np.array([ glyph.bbox[1] for glyph in group ])[g]
+        x, y = xs[cell], ys[cell]
+        px, py = x-1+x0, h-y+y0
+        ax, ay = x - dx*nudge, y - dy*nudge
+        bx, by = x + ox*nudge, y + oy*nudge
+        ax, ay = ax-1+x0, h-ay+y0
+        bx, by = bx-1+x0, h-by+y0
+
+        emit = 1 + chamfer[order]
+        pstate = np.repeat(order, emit)
+        pts = np.stack([ px[pstate], py[pstate] ], 1).tolist()
+
+        # chamfer points are floats, patch them in separately
+        cham = np.nonzero(chamfer[pstate])[0]
+        second = np.zeros(len(pstate), bool)
+        second[np.cumsum(emit)[emit == 2] - 1] = True
+        cs = pstate[cham]
+        cx = np.where(second[cham], bx[cs], ax[cs])
+        cy = np.where(second[cham], by[cs], ay[cs])
+        for i, p in zip(cham.tolist(), np.stack([ cx, cy ], 1).tolist()):
+            pts[i] = p
+
+        # split back into contours and glyphs
+        pstart = start[pstate]
+        cuts = np.nonzero(pstart[1:] != pstart[:-1])[0] + 1
+        bounds = [ 0, *cuts.tolist(), len(pts) ]
+        ends = np.searchsorted(g[pstate[bounds[:-1]]], np.arange(n+1)).tolist()
+        for i, glyph in enumerate(group):
+            set_contours(glyph, [
+                pts[bounds[j]:bounds[j+1]]
+                for j in range(ends[i], ends[i+1])
+            ])
+
+
+def vectorize_runs(glyphs, scale):
+    # same contours as vectorize_glyph, but only looks at the corners,
+    # found from the row transitions, then jumps straight from corner to
+    # corner, so the cost grows with the number of edges, not the area
+    for glyph in glyphs:
+        x0, y0, x1, y1 = glyph.bbox
+        codes, steps, starts = find_runs(glyph.bitmap, x1-x0, y1-y0)
+        place_contours(glyph, trace_runs(codes, steps, starts, 1/scale))
+
+
+def find_runs(bitmap, w, h):
+    # corner codes (as find_corners) of just the corners, and for each
+    # direction the next corner along that row/column.  an edge always
+    # runs from one corner to the next one in its row or column
+    bmp = [ 0, *(d<<1 for d in bitmap), 0 ]
+    codes = {}
+    starts = {}
+    rows = []
+    cols = {}
+    for y in range(h + 1):
+        a, b = bmp[y], bmp[y+1]
+        ta, tb = a ^ a>>1, b ^ b>>1
+        # odd number of pixels set, or a diagonal pair
+        bits = ta ^ tb | ta & tb & (a ^ b)>>1
+        row = []
+        while bits:
+            s = bits.bit_length() - 1
+            bits ^= 1<<s
+            x = w+1 - s
+            n = codes[x, y] = (a>>s & 3)<<2 | (b>>s & 3)
+            row.append(x)
+            cols.setdefault(x, []).append(y)
+            if x <= w:
+                for d in cornerdirs[n]:
+                    starts[x, y, *d] = True
+        rows.append(row)
+
+    steps = { R: {}, L: {}, D: {}, U: {} }
+    for y, row in enumerate(rows):
+        for x0, x1 in zip(row, row[1:]):
+            steps[R][x0, y] = x1, y
+            steps[L][x1, y] = x0, y
+    for x, col in cols.items():
+        for y0, y1 in zip(col, col[1:]):
+            steps[D][x, y0] = x, y1
+            steps[U][x, y1] = x, y0
+    return codes, steps, starts
+
+
+def trace_runs(codes, steps, corners, nudge):
+    # trace_corners, visiting only the corners
+    contours = []
+    while corners:
+        (x,y, dx,dy), _ = corners.popitem()
+        ctr = []
+        contours.append(ctr)
+        assert codes[x, y] not in diagonal or dx < 0 or dy > 0
+
+        while True:
+            n = codes[x, y]
+            if n in internal:
+                ctr.append((x, y))
+                dx,dy = dy, -dx
+            elif n not in diagonal or dx < 0 or dy > 0:
+                ctr.append((x, y))
+                dx,dy = -dy, dx
+            else:
+                ctr.append((x - dx*nudge, y - dy*nudge))
+                dx,dy = -dy, dx
+                ctr.append((x + dx*nudge, y + dy*nudge))
+
+            x, y = steps[dx, dy][x, y]
+            if ctr[0] == (x,y):
+                break
+            corners.pop((x,y, dx,dy), None)
+
+    return contours
+
+
+def trace_corners(n4, corners, nudge):
+    contours = []
     while corners:
         (x,y, dx,dy), _ = corners.popitem()
         ctr = []
@@ -158,16 +649,16 @@ def vectorize_glyph(glyph, scale):
 
         # corners end up sorted bottom to top,
         # so we never have to chamfer final segment
-        assert get4n(x, y) not in diagonal or dx < 0 or dy > 0
+        assert n4[y][x] not in diagonal or dx < 0 or dy > 0
 
         while True:
-            n4 = get4n(x, y)
-            if n4 not in cornerdirs:
+            n = n4[y][x]
+            if n not in cornerdirs:
                 pass
-            elif n4 in internal:
+            elif n in internal:
                 ctr.append((x, y))
                 dx,dy = dy, -dx
-            elif n4 not in diagonal or dx < 0 or dy > 0:
+            elif n not in diagonal or dx < 0 or dy > 0:
                 ctr.append((x, y))
                 dx,dy = -dy, dx
             else:
@@ -184,24 +675,7 @@ def vectorize_glyph(glyph, scale):
                 break
             corners.pop((x,y, dx,dy), None)
 
-        for i, (x, y) in enumerate(ctr):
-            ctr[i] = [ x-1+x0, h-y+y0 ]
-
-    if category := glyph.combining():
-        # implement combining marks by hacking their position to overlay
-        # previous glyph and clearing their advance.  this "works" but
-        # it's hacky and generates some validation warnings...
-        # FIXME reimplement combining marks using GPOS?
-        adv = glyph.advance
-        for ctr in contours:
-            for p in ctr:
-                p[0] -= adv
-
-        if category != 'Mc':
-            glyph.advance = 0
-        else:
-            # these are probably wrong (but we don't have any...)
-            print('FIXME: Mc:', glyph)
+    return contours
 
 
 R = (1,0)
@@ -230,6 +704,14 @@ internal = (0b1110, 0b1101, 0b1011, 0b0111)
 diagonal = (0b1001, 0b0110)
 
 
+tracers = {
+    'bits': partial(vectorize_glyphs, corners=find_corners),
+    'numpy': partial(vectorize_glyphs, corners=find_corners_numpy),
+    'atlas': vectorize_atlas,
+    'runs': vectorize_runs,
+}
+
+
 # https://developer.apple.com/fonts/TrueType-Reference-Manual/RM07/appendixB.html
 
 # The following character codes must be mapped to the first glyph
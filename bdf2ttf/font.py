@@ -5,6 +5,7 @@ from unicodedata import category
 class Font:
     def __init__(self):
         self.glyphs = {}
+        self.bitmaps = bytearray()  # packed storage shared by parsed bitmaps
         self.version = 0.0
 
     def __str__(self):
@@ -38,6 +39,7 @@ class Font:
         return glyph
 
     def add_glyph_uniart(self, code, img):
+        # in its own buffer, like clones (see Bitmap)
         glyph = Glyph.from_uniart(code, img)
         self.set_glyph(glyph)
         return glyph
@@ -60,7 +62,7 @@ class Glyph:
         return f'[{self.code:04x}] {self.name}: {bbox}{self.advance:+}{bits}'
 
     @classmethod
-    def from_uniart(cls, code, img):
+    def from_uniart(cls, code, img, buf=None):
         glyph = cls(code)
 
         img = img.split('\n')
@@ -77,7 +79,7 @@ class Glyph:
         xmax = max(xmax, x1)
         width = xmax - xmin
 
-        bmp = glyph.bitmap = []
+        bmp = []
         for y, row in enumerate(img):
             if row.lstrip().startswith('▔'):
                 y0 = y
@@ -89,6 +91,7 @@ class Glyph:
                     case '▀': bmp[-2] |= 1
                     case '▄': bmp[-1] |= 1
                     case '█': bmp[-2] |= 1;  bmp[-1] |= 1
+        glyph.bitmap = Bitmap.pack(bmp, width, buf)
 
         glyph.bbox = [
             xmin - x0, 2*(y0 - len(img)), xmax - x0, 2*y0
@@ -131,4 +134,97 @@ class Glyph:
     NULL = '\0'
     SPACE = ' '
 
+class Bitmap:
+    # 1bpp rows packed msb first (as in BDF), each padded to whole bytes.
+    # the rows live in a buffer shared by all glyphs parsed from a font, so
+    # this is just a view onto it;  indexing still gets/sets rows as right
+    # aligned ints, so mods can keep treating it like the list it used to
+    # be.  bitmaps made later (clones, uniart) get their own buffer, so the
+    # shared one never grows under an array() view
+    __slots__ = ('buf', 'offset', 'width', 'height', 'stride')
+
+    def __init__(self, buf, offset, width, height):
+        self.buf = buf
+        self.offset = offset
+        self.width = width
+        self.height = height
+        self.stride = (width + 7) >> 3
+
+    @classmethod
+    def frombytes(cls, bits, width, height, buf=None):
+        if buf is None:
+            buf = bytearray()
+        bmp = cls(buf, len(buf), width, height)
+        assert len(bits) == height * bmp.stride
+        buf += bits
+        return bmp
+
+    @classmethod
+    def pack(cls, rows, width, buf=None):
+        bmp = cls.frombytes(bytes(len(rows) * (width+7 >> 3)),
+                            width, len(rows), buf)
+        bmp[:] = rows
+        return bmp
+
+    def __len__(self):
+        return self.height
+
+    def __iter__(self):
+        for i in range(self.height):
+            yield self._get(i)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [ self._get(j) for j in range(self.height)[i] ]
+        return self._get(range(self.height)[i])
+
+    def __setitem__(self, i, v):
+        if isinstance(i, slice):
+            idx = range(self.height)[i]
+            v = list(v)
+            if len(v) != len(idx):
+                raise ValueError(f'cannot resize {self.height} row bitmap')
+            for j, u in zip(idx, v):
+                self._set(j, u)
+        else:
+            self._set(range(self.height)[i], v)
+
+    def _get(self, i):
+        o, n = self.offset + i*self.stride, self.stride
+        return int.from_bytes(self.buf[o:o+n], 'big') >> (n*8 - self.width)
+
+    def _set(self, i, v):
+        if not 0 <= v < 1<<self.width:
+            raise ValueError(f'row {v:#x} exceeds bitmap width {self.width}')
+        o, n = self.offset + i*self.stride, self.stride
+        self.buf[o:o+n] = (v << (n*8 - self.width)).to_bytes(n, 'big')
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __bytes__(self):
+        o = self.offset
+        return bytes(self.buf[o:o + self.height*self.stride])
+
+    def __repr__(self):
+        return f'Bitmap({self.width}x{self.height} {bytes(self).hex()})'
+
+    def __deepcopy__(self, memo):
+        # copies get their own buffer:  growing the shared one would fail
+        # while any array() view of it is alive
+        return Bitmap.frombytes(bytes(self), self.width, self.height)
+
+    def array(self):
+        # zero-copy (height, stride) view of the packed rows
+        import numpy as np
+        return np.frombuffer(self.buf, np.uint8, self.height*self.stride,
+                             self.offset).reshape(self.height, self.stride)
+
+    def pixels(self):
+        # unpacked (height, width) array of 0/1 pixels
+        import numpy as np
+        return np.unpackbits(self.array(), axis=1, count=self.width)
+
+
 Font.Glyph = Glyph
+Font.Bitmap = Bitmap
@@ -0,0 +1,204 @@
+from array import array
+from struct import unpack_from
+import sys
+
+from .bdf import BDFReader
+
+
+# table types
+PCF_PROPERTIES = 1<<0
+PCF_ACCELERATORS = 1<<1
+PCF_METRICS = 1<<2
+PCF_BITMAPS = 1<<3
+PCF_INK_METRICS = 1<<4
+PCF_BDF_ENCODINGS = 1<<5
+PCF_SWIDTHS = 1<<6
+PCF_GLYPH_NAMES = 1<<7
+PCF_BDF_ACCELERATORS = 1<<8
+
+# format bits
+PCF_GLYPH_PAD_MASK = 3<<0
+PCF_BYTE_MASK = 1<<2  # msbyte first
+PCF_BIT_MASK = 1<<3  # msbit first
+PCF_SCAN_UNIT_MASK = 3<<4
+PCF_COMPRESSED_METRICS = 0x100
+
+NO_GLYPH = 0xffff
+
+# reverse bits in a byte
+_bitrev = bytes(int(f'{b:08b}'[::-1], 2) for b in range(256))
+
+
+class PCFReader(BDFReader):
+    # reads the binary X11 format directly from its tables, filling in the
+    # same header, properties and per char values that BDFReader would
+    # parse from the equivalent BDF, so the rest of the conversion is shared
+    magic = b'\1fcp'
+
+    def stream(self, pcf, bitmaps=None):
+        self.bitmaps = bitmaps
+        data = self.data = memoryview(self.map(pcf))
+        assert data[:4] == self.magic, 'not a PCF font'
+
+        ntabs, = unpack_from('<i', data, 4)
+        self.toc = {}
+        for i in range(ntabs):
+            typ, fmt, size, off = unpack_from('<4i', data, 8 + 16*i)
+            self.toc[typ] = off
+
+        self._read_props()
+        metrics = self._read_metrics()
+        self._grok_header(metrics)
+        self._grok_scale()
+        return self._stream_chars(metrics)
+
+    def _table(self, typ):
+        # every table repeats its format, always little endian, then
+        # continues in the byte order it specifies
+        off = self.toc[typ]
+        fmt, = unpack_from('<i', self.data, off)
+        return fmt, '>' if fmt & PCF_BYTE_MASK else '<', off + 4
+
+    def _array(self, code, n, bo, off):
+        a = array(code)
+        a.frombytes(self.data[off : off + n*a.itemsize])
+        if (bo == '>') != (sys.byteorder == 'big'):
+            a.byteswap()
+        return a
+
+    def _read_props(self):
+        data = self.data
+        fmt, bo, off = self._table(PCF_PROPERTIES)
+        n, = unpack_from(bo+'i', data, off)
+        off += 4
+        props = [ unpack_from(bo+'ibi', data, off + 9*i) for i in range(n) ]
+        off += (9*n + 3) & ~3
+        size, = unpack_from(bo+'i', data, off)
+        strings = bytes(data[off+4 : off+4+size])
+
+        def string(i):
+            return strings[i : strings.index(b'\0', i)].decode('latin-1')
+
+        # route through the BDF value parser, so types match what it makes
+        for name, isstr, value in props:
+            if isstr:
+                value = '"' + string(value).replace('"', '""') + '"'
+            self._parse_kvp(self.props, string(name), str(value))
+
+    def _read_metrics(self):
+        data = self.data
+        fmt, bo, off = self._table(PCF_METRICS)
+        if fmt & PCF_COMPRESSED_METRICS:
+            n, = unpack_from(bo+'h', data, off)
+            m = data[off+2 : off+2 + 5*n]
+            return [
+                (m[i]-0x80, m[i+1]-0x80, m[i+2]-0x80, m[i+3]-0x80, m[i+4]-0x80)
+                for i in range(0, 5*n, 5)
+            ]
+        else:
+            n, = unpack_from(bo+'i', data, off)
+            return [
+                unpack_from(bo+'5h', data, off+4 + 12*i)
+                for i in range(n)
+            ]
+
+    def _grok_header(self, metrics):
+        # lsb, rsb, width, ascent, descent
+        props, info = self.props, self.info
+        info['FONT'] = props.pop('FONT', '')
+
+        resx = props.get('RESOLUTION_X', 75)
+        resy = props.get('RESOLUTION_Y', resx)
+        if 'POINT_SIZE' in props:
+            pt = props['POINT_SIZE'] / 10
+        else:
+            pt = props.get('PIXEL_SIZE', 0) * 72 / resy
+        info['SIZE'] = [ pt, resx, resy ]
+
+        x0 = min(m[0] for m in metrics)
+        x1 = max(m[1] for m in metrics)
+        y1 = max(m[3] for m in metrics)
+        y0 = -max(m[4] for m in metrics)
+        info['FONTBOUNDINGBOX'] = [ x1-x0, y1-y0, x0, y0 ]
+
+    def _read_encodings(self):
+        data = self.data
+        fmt, bo, off = self._table(PCF_BDF_ENCODINGS)
+        col0, col1, row0, row1, default = unpack_from(bo+'5h', data, off)
+        ncols = col1 - col0 + 1
+        index = self._array('H', ncols * (row1-row0+1), bo, off + 10)
+        return [
+            (g, (row0 + i//ncols)<<8 | (col0 + i%ncols))
+            for i, g in enumerate(index)
+            if g != NO_GLYPH
+        ]
+
+    def _read_names(self):
+        if PCF_GLYPH_NAMES not in self.toc:
+            return None
+        data = self.data
+        fmt, bo, off = self._table(PCF_GLYPH_NAMES)
+        n, = unpack_from(bo+'i', data, off)
+        offsets = self._array('i', n, bo, off + 4)
+        off += 4 + 4*n
+        size, = unpack_from(bo+'i', data, off)
+        strings = bytes(data[off+4 : off+4+size])
+        return [
+            strings[i : strings.index(b'\0', i)].decode('latin-1')
+            for i in offsets
+        ]
+
+    def _read_bitmaps(self):
+        data = self.data
+        fmt, bo, off = self._table(PCF_BITMAPS)
+        n, = unpack_from(bo+'i', data, off)
+        offsets = self._array('i', n, bo, off + 4)
+        off += 4 + 4*n
+        sizes = unpack_from(bo+'4i', data, off)
+        off += 16
+        bits = data[off : off + sizes[fmt & PCF_GLYPH_PAD_MASK]]
+
+        # normalize to msbit first, which is also what BDF (and Bitmap) use
+        unit = 1 << ((fmt & PCF_SCAN_UNIT_MASK) >> 4)
+        if not fmt & PCF_BIT_MASK:
+            bits = memoryview(bytes(bits).translate(_bitrev))
+        if unit > 1 and bool(fmt & PCF_BYTE_MASK) != bool(fmt & PCF_BIT_MASK):
+            swapped = array('HI'[unit>>2])
+            swapped.frombytes(bits)
+            swapped.byteswap()
+            bits = memoryview(swapped).cast('B')
+
+        return bits, offsets, 1 << (fmt & PCF_GLYPH_PAD_MASK)
+
+    def _stream_chars(self, metrics):
+        bits, offsets, pad = self._read_bitmaps()
+        names = self._read_names()
+
+        for g, code in sorted(self._read_encodings()):
+            if not self.wanted(code):
+                continue
+
+            lsb, rsb, adv, asc, desc = metrics[g]
+            w, h = rsb - lsb, asc + desc
+            stride = (w + 7) >> 3
+            rowbytes = (w + 8*pad - 1) // (8*pad) * pad
+
+            o = offsets[g]
+            if rowbytes == stride:
+                bmp = bits[o : o + h*stride]
+            else:
+                bmp = b''.join(
+                    bits[r : r+stride]
+                    for r in range(o, o + h*rowbytes, rowbytes)
+                )
+
+            yield self._grok_char({
+                'CHAR': names[g] if names else f'char{code}',
+                'ENCODING': code,
+                # SWIDTHS are relative to the BDF SIZE line, which PCF loses
+                # (and may disagree with the properties), so use the pixels
+                'SWIDTH': [ adv * 1000 / self._sx, 0 ],
+                'DWIDTH': [ adv, 0 ],
+                'BBX': [ w, h, lsb, -desc ],
+                'BITMAP': bmp,
+            })
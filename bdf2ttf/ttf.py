@@ -1,20 +1,29 @@
 from math import log2, ceil, pi, tan
 from array import array
-from collections import namedtuple
-from struct import pack, unpack
+from collections import Counter, namedtuple
+from itertools import accumulate
+from struct import pack, pack_into
 from datetime import datetime, timezone
+from io import BytesIO
 import re
+import sys
 
 
 class TTFWriter:
-    def __init__(self, font):
+    def __init__(self, font, composite=False, strike=None, ppems=()):
         self.font = font
 
-        glyphs = self.glyphs = sorted(
-            (g for c, g in font.glyphs.items()
-             if g.code == c or g.code == ord(c)),
-            key=lambda g: g.code
-        )
+        # .notdef and .null first (as required), then any glyphs with an
+        # unusual advance (eg zero width combining marks), then the rest,
+        # so hmtx can leave off the trailing advances that are all the same
+        glyphs = [
+            g for c, g in font.glyphs.items()
+            if g.code == c or g.code == ord(c)
+        ]
+        usual = Counter(g.advance for g in glyphs).most_common(1)[0][0]
+        glyphs = self.glyphs = sorted(glyphs, key=lambda g: (
+            g.code > 0, g.code > 0 and g.advance == usual, g.code
+        ))
 
         # NB offsets are determined by writing glyf, which is *after* loca
         offsets = array('I', (0 for _ in range(len(glyphs)+1)))
@@ -27,64 +36,84 @@ class TTFWriter:
         self.hmtx = HorizontalMetrics(font, glyphs)
         self.cmap = CharacterMap(font, glyphs)
         self.loca = LocationIndex(font, offsets)
-        self.glyf = GlyphData(font, glyphs, offsets)
+        self.glyf = GlyphData(font, glyphs, offsets, composite)
+        self.maxp.components = self.glyf.components
         self.name = Naming(font)
         self.post = PostScript(font)
         self.gasp = Grayscale(font)
 
+        # optional precomputed device metrics at these ppems
+        devices = []
+        if ppems:
+            ppems = sorted(set(ppems))
+            self.ltsh = LinearThreshold(font, glyphs)
+            self.vdmx = VerticalDeviceMetrics(font, ppems)
+            self.hdmx = HorizontalDeviceMetrics(font, glyphs, ppems)
+            devices = [ self.ltsh, self.vdmx, self.hdmx ]
+
+        # optional strike of the original bitmaps at this ppem
+        bitmaps = []
+        if strike:
+            self.ebdt = BitmapData(font, glyphs, strike)
+            self.eblc = BitmapLocation(font, self.ebdt)
+            bitmaps = [ self.ebdt, self.eblc ]
+
         # recommended table order from OpenType spec
         self.tables = [
             self.head, self.hhea, self.maxp, self.os2,
-            self.hmtx, # 'LTSH' 'VDMX' 'hdmx'
+            self.hmtx, *devices,
             self.cmap, # 'fpgm' 'prep' 'cvt '
             self.loca, self.glyf, # 'kern'
-            self.name, self.post, self.gasp, # 'PCLT', 'DSIG'
+            self.name, self.post, self.gasp,
+            *bitmaps, # 'PCLT', 'DSIG'
         ]
 
     TTF_SCALER = 0x00010000
 
     def write(self, file):
-        start = file.tell()
+        # assemble the whole font in memory and write it in one go, so the
+        # target doesn't need to be seekable (or even a real file)
+        file.write(self.assemble())
+
+    def assemble(self):
+        # returns the font, with offset, size and chksum set in each table
         tabs = self.tables
         ntabs = len(tabs)
+
+        # loca offsets, and so its format in head, are determined by
+        # writing glyf, so do that first
+        for tab in sorted(tabs, key=lambda t: t is not self.glyf):
+            if tab is self.head:
+                assert self.loca.offsets[-1]
+                tab.indexfmt = self.loca.indexfmt
+            out = BytesIO()
+            tab.write(out)
+            tab.data = out.getbuffer()
+            tab.size = len(tab.data)
+
+        off = 12 + ntabs*0x10
+        for tab in tabs:
+            tab.offset = off
+            off += tab.size + 3 & ~3
+
+        buf = bytearray(off)
         splitl2 = int(log2(ntabs|1))
         split = 1 << splitl2
         rem = max(0, ntabs - split)
-        wrpk(file, '>I4H',
+        pack_into('>I4H', buf, 0,
             self.TTF_SCALER, ntabs, split*0x10, splitl2, rem*0x10)
 
-        tocoff = file.tell()
-        file.write(bytes(ntabs * 0x10))  # reserve space for ToC
-
         for tab in tabs:
-            self.write_table(file, tab)
-        end = file.tell()
+            buf[tab.offset : tab.offset + tab.size] = tab.data
+            tab.chksum = sum_u32(buf[tab.offset : tab.offset + tab.size+3 & ~3])
+            del tab.data
 
-        # overwrite loca reservation w/updated offsets
-        assert self.loca.offsets[-1]
-        file.seek(self.loca.offset)
-        self.write_table(file, self.loca)
-
-        file.seek(tocoff)
-        for tab in sorted(tabs, key=lambda t: t.tag):
-            wrpk(file, '>4s3I',
+        for i, tab in enumerate(sorted(tabs, key=lambda t: t.tag)):
+            pack_into('>4s3I', buf, 12 + i*0x10,
                 tab.tag.ljust(4).encode(), tab.chksum, tab.offset, tab.size)
 
-        file.seek(start)
-        self.head.update_checksum(file, sum_file_u32(file, end-start))
-
-    @staticmethod
-    def write_table(file, table):
-        table.offset = file.tell()
-        table.write(file)
-        end = file.tell()
-
-        table.size = end - table.offset
-        file.write(bytes(4-(end&3) & 3))
-        assert not file.tell()&3
-
-        file.seek(table.offset)
-        table.chksum = sum_file_u32(file, table.size)
+        self.head.update_checksum(buf, sum_u32(buf))
+        return buf
 
 
 class Table:
@@ -127,9 +156,8 @@ class Header(Table):
             *font.bbox, self.style, self.lowestRecPPEM,
             2, self.indexfmt, 0)
 
-    def update_checksum(self, file, chk):
-        file.seek(self.offset + 8)
-        wrpk(file, '>I', (self.CHK_MAGIC - chk) & (1<<32)-1)
+    def update_checksum(self, buf, chk):
+        pack_into('>I', buf, self.offset + 8, (self.CHK_MAGIC - chk) & (1<<32)-1)
 
 
 NameRec = namedtuple('NameRec', 'plat enc lang id str')
@@ -219,6 +247,7 @@ class MaximumProfile(Table):
     def __init__(self, *args):
         super().__init__(*args)
         self.version = 1.0
+        self.components = {}
 
     def write(self, file):
         wrpk(file, '>I', p16(self.version))
@@ -227,14 +256,25 @@ class MaximumProfile(Table):
 
     def _write_v1(self, file):
         maxpts, maxctrs = 0, 0
-        for g in self.glyphs:
+        for i, g in enumerate(self.glyphs):
+            if i in self.components:
+                continue
             ctrs = g.contours
             nc = len(ctrs)
             np = sum(len(c) for c in ctrs)
             if maxpts < np: maxpts = np
             if maxctrs < nc: maxctrs = nc
 
-        wrpk(file, '>6H16x', len(self.glyphs), maxpts, maxctrs, 0, 0, 2)
+        # composites only reference simple glyphs, so depth is 1
+        glyphs, comps = self.glyphs, self.components
+        maxcpts = max((
+            sum(len(c) for c in glyphs[i].contours) for i in comps
+        ), default=0)
+        maxcctrs = max((len(glyphs[i].contours) for i in comps), default=0)
+        maxelems = max(map(len, comps.values()), default=0)
+
+        wrpk(file, '>6H12x2H', len(glyphs), maxpts, maxctrs,
+            maxcpts, maxcctrs, 2, maxelems, 1 if comps else 0)
 
 
 class OS2(Table):
@@ -348,26 +388,111 @@ class HorizontalHeader(Table):
 
         #assert font.caret[0] == 0
 
+        nmetrics = HorizontalMetrics.count(self.glyphs)
+
         print(f'hhea: ascent={font.ascent} descent={font.descent}'
               f' linegap={font.linegap} fixed={font.fixedpitch}')
         print(f'\tmaxadv={maxadv} maxext={maxext}'
-              f' minlsb={minlsb} minrsb={minrsb}')
+              f' minlsb={minlsb} minrsb={minrsb} hmetrics={nmetrics}')
 
-        wrpk(file, '>I3h H6h10xh', p16(self.version),
+        wrpk(file, '>I3h H6h10xH', p16(self.version),
             font.ascent, -font.descent, font.linegap,
             maxadv, minlsb, minrsb, maxext, *self.caret,
             # "It is suggested that monospaced fonts set numberOfHMetrics to 3"
-            len(self.glyphs))
+            # (which needs all the other advances to be the same)
+            nmetrics)
 
 
 class HorizontalMetrics(Table):
     tag = 'hmtx'
 
+    @staticmethod
+    def count(glyphs):
+        # glyphs after the last full metric repeat its advance,
+        # so only their lsb is stored
+        n = len(glyphs)
+        while n > 1 and glyphs[n-2].advance == glyphs[n-1].advance:
+            n -= 1
+        return n
+
     def write(self, file):
-        font = self.font
-        # FIXME implement that tail compression
-        for g in self.glyphs:
-            wrpk(file, '>Hh', g.advance, g.calc_bbox()[0])
+        glyphs = self.glyphs
+        n = self.count(glyphs)
+        lsbs = [ g.calc_bbox()[0] for g in glyphs ]
+        metrics = [ v for g, lsb in zip(glyphs, lsbs) for v in (g.advance, lsb) ]
+        file.write(pack(f'>{"Hh"*n}{len(glyphs)-n}h',
+                        *metrics[:2*n], *lsbs[n:]))
+
+
+class LinearThreshold(Table):
+    tag = 'LTSH'
+
+    def write(self, file):
+        # there are no instructions to stop the advances scaling linearly,
+        # so every glyph is linear from the first ppem
+        n = len(self.glyphs)
+        wrpk(file, '>2H', 0, n)
+        file.write(bytes([ 1 ]) * n)
+
+
+class VerticalDeviceMetrics(Table):
+    tag = 'VDMX'
+
+    def __init__(self, font, ppems):
+        super().__init__(font)
+        self.ppems = ppems
+
+    def write(self, file):
+        # one ratio (0:0, meaning all of them) with one group of the
+        # font's pixel extents at each ppem
+        font, ppems = self.font, self.ppems
+        n = len(ppems)
+        upm = round(font.size)
+        _, y0, _, y1 = font.bbox
+        print(f'VDMX: ppems={ppems}')
+        wrpk(file, '>3H 4B H H2B', 1, 1, 1, 0, 0, 0, 0, 12,
+            n, ppems[0], ppems[-1])
+        file.write(pack(f'>{"H2h"*n}', *(
+            v for ppem in ppems
+            for v in (ppem, -(-y1*ppem // upm), y0*ppem // upm)
+        )))
+
+
+class HorizontalDeviceMetrics(Table):
+    tag = 'hdmx'
+
+    def __init__(self, font, glyphs, ppems):
+        super().__init__(font, glyphs)
+        self.ppems = ppems
+
+    def write(self, file):
+        n = len(self.glyphs)
+        size = n+2 + 3 & ~3
+        wrpk(file, '>HhI', 0, len(self.ppems), size)
+        for ppem, widths in zip(self.ppems, self.widths()):
+            wrpk(file, '>2B', ppem, max(widths))
+            file.write(widths)
+            file.write(bytes(size - 2 - n))
+
+    def widths(self):
+        # rounded pixel advances of all glyphs at each ppem.  there are only
+        # a few distinct advances, so just scale those and translate an
+        # index of every glyph's advance through them, as one bytes op
+        upm = round(self.font.size)
+        advances = [ g.advance for g in self.glyphs ]
+        distinct = sorted(set(advances))
+        if len(distinct) > 256:
+            for ppem in self.ppems:
+                yield bytes(min(255, (2*a*ppem + upm) // (2*upm))
+                            for a in advances)
+            return
+
+        index = bytes(map({ a: i for i, a in enumerate(distinct) }.get,
+                          advances))
+        for ppem in self.ppems:
+            scaled = bytes(min(255, (2*a*ppem + upm) // (2*upm))
+                           for a in distinct)
+            yield index.translate(scaled.ljust(256, b'\0'))
 
 
 class CharacterMap(Table):
@@ -382,14 +507,23 @@ class CharacterMap(Table):
             for c, g in font.glyphs.items()
         }
         maxcode = max(cmap.keys())
-        assert maxcode == glyphs[-1].code
+        assert maxcode >= max(g.code for g in glyphs)
+
+        # codes mapped to .notdef look up the same as unmapped ones,
+        # so leave them out and let segments skip or span them
+        cmap = { c: i for c, i in cmap.items() if i and c >= 0 }
         segs = self.segs = self.segment(cmap)
         print(f'cmap: {len(cmap)} codepoints maxcode={maxcode:04x}'
-              f' {len(segs)} segments')
+              f' {len(segs)} runs')
 
         subtabs = self.subtabs = [ CMAPSegmentDelta(segs) ]
         if maxcode >= 1<<16:
-            subtabs.append(CMAPSegmentCoverage(segs))
+            subtabs.append(min(
+                CMAPSegmentCoverage(segs), CMAPManyToOne(cmap),
+                key=lambda tab: tab.size))
+        for tab in subtabs:
+            print(f'\tformat {tab.format}: {len(tab.segs)} segments'
+                  f' {tab.size} bytes')
 
     @staticmethod
     def segment(cmap):
@@ -426,19 +560,59 @@ class CharacterMap(Table):
 class CMAPSegmentDelta:
     platform = 0
     encoding = 3
+    format = 4
 
     def __init__(self, segs):
-        segs = self.segs = segs[:]
-        while segs[-1][1] > 0xffff:
+        segs = segs[:]
+        while segs and segs[-1][1] > 0xffff:
             segs.pop()
-        if segs[-1][-1] > 0xffff:
+        if segs and segs[-1][-1] > 0xffff:
             segs[-1] = segs[-1][:2] + [ 0xffff ]
-        if segs[-1][-1] < 0xffff:
+        segs = self.segs = self.optimize(segs)
+        if not segs or segs[-1][-1] < 0xffff:
             segs.append([ 0, 0xffff, 0xffff ])
 
+    @staticmethod
+    def optimize(runs):
+        # choose segments of minimal total size:  each run of codes mapped
+        # to consecutive glyphs on its own, with an idDelta (8 bytes), or
+        # several neighboring runs together, gaps and all, with glyph ids
+        # in the idRangeOffset array (8 bytes plus 2 per code)
+        n = len(runs)
+        best = [ 0 ]*(n+1)
+        first = [ 0 ]*(n+1)
+        for j in range(1, n+1):
+            best[j] = best[j-1] + 8
+            first[j] = j-1
+            c1 = runs[j-1][2]
+            for i in range(j-2, -1, -1):
+                size = 8 + 2*(c1 - runs[i][1] + 1)
+                if size >= best[j]:
+                    break
+                if best[i] + size < best[j]:
+                    best[j] = best[i] + size
+                    first[j] = i
+
+        segs = []
+        j = n
+        while j:
+            i = first[j]
+            if i == j-1:
+                segs.append(runs[i])
+            else:
+                c0, c1 = runs[i][1], runs[j-1][2]
+                ids = [ 0 ]*(c1 - c0 + 1)
+                for g0, r0, r1 in runs[i:j]:
+                    ids[r0-c0 : r1-c0+1] = range(g0, g0 + r1-r0+1)
+                segs.append([ ids, c0, c1 ])
+            j = i
+        segs.reverse()
+        return segs
+
     @property
     def size(self):
-        return 2*8 + 2*4*len(self.segs)
+        return 2*8 + 2*4*len(self.segs) + sum(
+            2*len(seg[0]) for seg in self.segs if isinstance(seg[0], list))
 
     def write(self, file):
         segs = self.segs
@@ -447,23 +621,28 @@ class CMAPSegmentDelta:
         split = 1 << splitl2
         rem = max(0, nsegs - split)
 
-        off0 = file.tell()
-        wrpk(file, '>7H', 4, self.size, 0, nsegs*2, split*2, splitl2, rem*2)
+        # indexed segments have no delta, and their idRangeOffset points
+        # (from itself) to their part of the glyph id array
+        deltas, offsets, ids = [], [], []
+        for i, (g0, c0, c1) in enumerate(segs):
+            if isinstance(g0, list):
+                deltas.append(0)
+                offsets.append(2*(nsegs - i + len(ids)))
+                ids += g0
+            else:
+                deltas.append(g0-c0 & 0xffff)
+                offsets.append(0)
 
-        for seg in segs:
-            wrpk(file, '>H', seg[-1])
-        wrpk(file, '>2x')
-        for seg in segs:
-            wrpk(file, '>H', seg[1])
-        for seg in segs:
-            delta = seg[0]-seg[1] & 0xffff
-            wrpk(file, '>H', delta)
-        file.write(b'\0' * (2*nsegs))
+        file.write(pack(f'>7H{nsegs}H2x{3*nsegs + len(ids)}H',
+            self.format, self.size, 0, nsegs*2, split*2, splitl2, rem*2,
+            *(seg[2] for seg in segs), *(seg[1] for seg in segs),
+            *deltas, *offsets, *ids))
 
 
 class CMAPSegmentCoverage:
     platform = 0
     encoding = 4
+    format = 12
 
     def __init__(self, segs):
         self.segs = segs
@@ -474,17 +653,36 @@ class CMAPSegmentCoverage:
 
     def write(self, file):
         segs = self.segs
-        wrpk(file, '>2H3I', 12, 0, self.size, 0, len(segs))
+        wrpk(file, '>2H3I', self.format, 0, self.size, 0, len(segs))
         for glyph0, char0, char1 in segs:
             wrpk(file, '>3I', char0, char1, glyph0)
 
 
+class CMAPManyToOne(CMAPSegmentCoverage):
+    # same layout as format 12, but every code in a group maps to the same
+    # glyph, so only pays off for fonts with big ranges of one glyph
+    encoding = 6
+    format = 13
+
+    def __init__(self, cmap):
+        seg = [ None, None, None ]
+        segs = self.segs = []
+        for code in sorted(cmap.keys()):
+            idx = cmap[code]
+            if code-1 == seg[-1] and idx == seg[0]:
+                seg[-1] = code
+            else:
+                seg = [ idx, code, code ]
+                segs.append(seg)
+
+
 class GlyphData(Table):
     tag = 'glyf'
 
-    def __init__(self, font, glyphs, offsets):
+    def __init__(self, font, glyphs, offsets, composite=False):
         super().__init__(font, glyphs)
         self.offsets = offsets
+        self.components = self.find_components() if composite else {}
 
     def write(self, file):
         font = self.font
@@ -492,12 +690,109 @@ class GlyphData(Table):
 
         for i, g in enumerate(self.glyphs):
             self.offsets[i] = file.tell() - off0 # save for loca index
-            self._write_glyph(file, g)
+            if comps := self.components.get(i):
+                file.write(self._pack_composite(g, comps))
+            else:
+                file.write(self._simple(g))
 
             # Font-Validator W1701 "Loca references a glyf entry which length is not a multiple of 4"
             file.write(bytes(4-(file.tell()&3) & 3))
 
         self.offsets[i+1] = file.tell() - off0 # save for loca index
+        print(f'glyf: {len(self.glyphs)} glyphs, {self.offsets[-1]} bytes')
+
+    def _simple(self, glyph):
+        # keep the serialized record with the glyph (for the glyph cache)
+        if (data := getattr(glyph, 'glyf', None)) is None:
+            buf = BytesIO()
+            self._write_glyph(buf, glyph)
+            data = glyph.glyf = buf.getvalue()
+        return data
+
+    def find_components(self):
+        # contours trace the same wherever a shape is, so a glyph whose
+        # contours are all copies of the contours of earlier simple glyphs,
+        # each moved by one offset, can reference those glyphs instead:
+        # clones, shifted glyphs and letters with separate accents
+        ids = {}  # contours relative to their start -> small int
+        def norm(ctr):
+            x0, y0 = ctr[0]
+            return ids.setdefault(
+                tuple((x-x0, y-y0) for x, y in ctr), len(ids))
+
+        glyphs = self.glyphs
+        keys_of = {}  # per simple glyph, its normalized contours
+        shapes = {}  # and the set of them
+        byfirst = {}  # first contour of simple glyphs -> their indices
+        sigs = set()
+        components = {}
+        for i, g in enumerate(glyphs):
+            if not (ctrs := g.contours):
+                continue
+            keys = [ norm(c) for c in ctrs ]
+            where = {
+                (k, *c[0]): j
+                for j, (k, c) in enumerate(zip(keys, ctrs))
+            }
+
+            # every earlier glyph that fits somewhere, with the contours
+            # it would cover
+            fits = []
+            present = set(keys)
+            for j, key in enumerate(keys):
+                for h in byfirst.get(key, ()):
+                    if not shapes[h] <= present:
+                        continue
+                    hctrs = glyphs[h].contours
+                    dx = ctrs[j][0][0] - hctrs[0][0][0]
+                    dy = ctrs[j][0][1] - hctrs[0][0][1]
+                    covers = set()
+                    for k, c in zip(keys_of[h], hctrs):
+                        jc = where.get((k, c[0][0]+dx, c[0][1]+dy))
+                        if jc is None:
+                            break
+                        covers.add(jc)
+                    else:
+                        fits.append((len(covers), h, dx, dy, covers))
+
+            # take the biggest that don't overlap until all are covered
+            comps = []
+            left = set(range(len(ctrs)))
+            for _, h, dx, dy, covers in sorted(fits, key=lambda f: -f[0]):
+                if covers <= left:
+                    comps.append((h, dx, dy))
+                    left -= covers
+            if not left and \
+               len(self._pack_composite(g, comps)) < len(self._simple(g)):
+                components[i] = comps
+            else:
+                # only the first of identical simple glyphs is needed
+                x0, y0 = ctrs[0][0]
+                sig = tuple((k, c[0][0]-x0, c[0][1]-y0) for k, c in zip(keys, ctrs))
+                if sig not in sigs:
+                    sigs.add(sig)
+                    shapes[i] = frozenset(keys)
+                    keys_of[i] = keys
+                    byfirst.setdefault(keys[0], []).append(i)
+
+        print(f'glyf: {len(components)} composite glyphs,'
+              f' {sum(map(len, components.values()))} components')
+        return components
+
+    def _pack_composite(self, glyph, comps):
+        fmt = [ '>5h' ]
+        args = [ -1, *glyph.calc_bbox() ]
+        for k, (idx, dx, dy) in enumerate(comps):
+            flags = 1<<1  # ARGS_ARE_XY_VALUES
+            if k < len(comps)-1:
+                flags |= 1<<5  # MORE_COMPONENTS
+            if -0x80 <= dx < 0x80 and -0x80 <= dy < 0x80:
+                fmt.append('2H2b')
+            else:
+                flags |= 1<<0  # ARG_1_AND_2_ARE_WORDS
+                fmt.append('2H2h')
+            args += [ flags, idx, dx, dy ]
+        return pack(''.join(fmt), *args)
 
     def _write_glyph(self, file, glyph):
         ctrs = glyph.contours
@@ -505,61 +800,65 @@ class GlyphData(Table):
         if nctrs == 0:
             return # no data written
 
-        wrpk(file, '>5h', nctrs, *glyph.calc_bbox())
-
-        n = 0
-        for c in ctrs:
-            assert c
-            n += len(c)
-            wrpk(file, '>H', n-1)
-
-        wrpk(file, '>H', 0)  # no hinting...
+        assert all(ctrs)
+        ends = list(accumulate(map(len, ctrs)))
 
         xs = [ p[0] for c in ctrs for p in c ]
         ys = [ p[1] for c in ctrs for p in c ]
-        for i in reversed(range(1, n)):  # convert to relative
-            xs[i] -= xs[i-1]
-            ys[i] -= ys[i-1]
-
-        def classify_coord(du):
-            if du == 0:
-                return 1<<4
-            if abs(du) >= 0x100:
-                return 0
-            if du > 0:
-                return 1<<1 | 1<<4
-            return 1<<1
-
-        flags = bytes(
-            1 | classify_coord(dx) | classify_coord(dy)<<1
+        bbox = min(xs), min(ys), max(xs), max(ys)  # same as calc_bbox()
+        xs = [ b-a for a, b in zip([ 0, *xs ], xs) ]  # convert to relative
+        ys = [ b-a for a, b in zip([ 0, *ys ], ys) ]
+
+        # on curve, and per axis: zero deltas (that repeat the previous
+        # coordinate) are omitted, short ones are unsigned bytes with the
+        # sign in the flags, the rest are shorts
+        flags = [
+            1 | _coordflags[dx] | _coordflags[dy]<<1
             for dx, dy in zip(xs, ys)
-        )
-
-        for i in reversed(range(n)):
-            if flags[i] & 0x12 == 0x10:
-                del xs[i]
-            if flags[i]>>1 & 0x12 == 0x10:
-                del ys[i]
+        ]
 
-        # FIXME RLE compress flags
-        file.write(flags)
+        # repeat flags with a count instead of writing out runs
+        flags = _flagruns.sub(_repeat_flags, bytes(flags))
 
-        for u in xs:
-            if abs(u) >= 0x100:
-                wrpk(file, '>h', u)
-            else:
-                wrpk(file, '>B', abs(u))
+        # build one format for the header, flags and all coordinates
+        fmt = [ f'>5h{nctrs}HH{len(flags)}s' ]
+        args = [ nctrs, *bbox, *(e-1 for e in ends), 0, flags ]
 
-        for u in ys:
-            if abs(u) >= 0x100:
-                wrpk(file, '>h', u)
-            else:
-                wrpk(file, '>B', abs(u))
+        for us in xs, ys:
+            us = [ u for u in us if u ]
+            fmt += [ 'B' if -0x100 < u < 0x100 else 'h' for u in us ]
+            args += [ abs(u) if -0x100 < u < 0x100 else u for u in us ]
 
-        if file.tell() & 1:
+        data = pack(''.join(fmt), *args)
+        file.write(data)
+        if len(data) & 1:
             wrpk(file, '>x')
 
 
+class CoordFlags(dict):
+    # x flags for a delta (shift left for y), memoized since the same few
+    # deltas keep coming up
+    def __missing__(self, du):
+        if du == 0:
+            f = 1<<4
+        elif du <= -0x100 or du >= 0x100:
+            f = 0
+        elif du > 0:
+            f = 1<<1 | 1<<4
+        else:
+            f = 1<<1
+        self[du] = f
+        return f
+
+_coordflags = CoordFlags()
+
+# runs of 3 or more identical flags (at most 1 + 255 repeats)
+_flagruns = re.compile(rb'(.)\1{2,255}', re.S)
+
+def _repeat_flags(m):
+    return bytes((m[1][0] | 1<<3, len(m[0]) - 1))
+
+
 class LocationIndex(Table):
     tag = 'loca'
 
@@ -567,9 +866,115 @@ class LocationIndex(Table):
         super().__init__(font)
         self.offsets = offsets
 
+    @property
+    def indexfmt(self):
+        # short offsets are stored halved, so need all glyphs 2 aligned
+        offsets = self.offsets
+        if offsets[-1] < 0x20000 and not any(off & 1 for off in offsets):
+            return 0
+        return 1
+
+    def write(self, file):
+        offsets = self.offsets
+        if self.indexfmt == 0:
+            file.write(pack(f'>{len(offsets)}H', *(off >> 1 for off in offsets)))
+        else:
+            file.write(pack(f'>{len(offsets)}I', *offsets))
+
+
+class BitmapData(Table):
+    tag = 'EBDT'
+    VERSION = 2.0
+
+    def __init__(self, font, glyphs, ppem):
+        super().__init__(font, glyphs)
+        self.ppem = ppem
+
+        # consecutive glyphs with the same metrics share an index subtable
+        # (format 2: one big metrics and image size for the whole range),
+        # and each image is just its pixels, bit aligned (format 5), so a
+        # monospace strike is hardly more than the bits themselves.
+        # runs are [ first, last, metrics, offset of first image ]
+        self.runs = runs = []
+        off = 4
+        for gid, g in enumerate(glyphs):
+            if not g.bitmap:
+                continue
+            bmp = g.bitmap
+            metrics = (bmp.height, bmp.width, *g.sbit)
+            run = runs[-1] if runs else None
+            if run and run[1] == gid-1 and run[2] == metrics:
+                run[1] = gid
+            else:
+                runs.append([ gid, gid, metrics, off ])
+            off += bmp.width*bmp.height + 7 >> 3
+
+    @staticmethod
+    def imagesize(metrics):
+        h, w, *_ = metrics
+        return w*h + 7 >> 3
+
+    def write(self, file):
+        glyphs = self.glyphs
+        images = []
+        for first, last, metrics, _ in self.runs:
+            h, w, *_ = metrics
+            n = w*h
+            pad = 8*self.imagesize(metrics) - n
+            for g in glyphs[first : last+1]:
+                bits = 0
+                for row in g.bitmap:
+                    bits = bits << w | row
+                images.append((bits << pad).to_bytes(n + pad >> 3, 'big'))
+
+        print(f'EBDT: {self.ppem}ppem {len(images)} bitmaps'
+              f' in {len(self.runs)} runs')
+        wrpk(file, '>I', p16(self.VERSION))
+        file.write(b''.join(images))
+
+
+class BitmapLocation(Table):
+    tag = 'EBLC'
+    VERSION = 2.0
+
+    def __init__(self, font, ebdt):
+        super().__init__(font, ebdt.glyphs)
+        self.ebdt = ebdt
+
     def write(self, file):
-        for off in self.offsets:
-            wrpk(file, '>I', off)
+        font, ebdt = self.font, self.ebdt
+        ppem, runs = ebdt.ppem, ebdt.runs
+        n = len(runs)
+        px = ppem / font.size
+        ascent, descent = round(font.ascent * px), round(font.descent * px)
+        vadv = ascent + descent
+
+        # sbitLineMetrics from all the glyph metrics: ascender, descender,
+        # widthMax, caret slope and offset, minOriginSB, minAdvanceSB,
+        # maxBeforeBL, minAfterBL
+        metrics = [ m for _, _, m, _ in runs ]
+        lines = pack('>bbB7b2x',
+            ascent, -descent, max(w for h, w, *_ in metrics), 1, 0, 0,
+            min(x0 for h, w, x0, y1, adv in metrics),
+            min(adv - x0 - w for h, w, x0, y1, adv in metrics),
+            max(y1 for h, w, x0, y1, adv in metrics),
+            min(y1 - h for h, w, x0, y1, adv in metrics))
+
+        # header, one bitmapSize, then the indexSubTableArray followed
+        # by all its (fixed size) format 2 subtables
+        wrpk(file, '>2I', p16(self.VERSION), 1)
+        wrpk(file, '>4I', 8+48, 28*n, n, 0)
+        file.write(lines)
+        file.write(lines)
+        wrpk(file, '>2H4B', runs[0][0], runs[-1][1], ppem, ppem, 1, 1)
+
+        file.write(pack(f'>{"2HI"*n}',
+            *(v for i, (first, last, _, _) in enumerate(runs)
+                for v in (first, last, 8*n + 20*i))))
+        for first, last, metrics, off in runs:
+            h, w, x0, y1, adv = metrics
+            wrpk(file, '>2HI I BBbbBbbB', 2, 5, off, ebdt.imagesize(metrics),
+                 h, w, x0, y1, adv, -(w//2), 0, vadv)
 
 
 def p16(v):
@@ -584,8 +989,11 @@ def wrpk(file, fmt, *args):
         raise
 
 
-def sum_file_u32(file, size):
-    return sum(
-        unpack('>I', file.read(4))[0]
-        for j in range((size + 3) // 4)
-    ) & (1<<32)-1
+def sum_u32(data):
+    # data is padded to whole words
+    words = array('I')
+    assert words.itemsize == 4
+    words.frombytes(data)
+    if sys.byteorder == 'little':
+        words.byteswap()
+    return sum(words) & (1<<32)-1
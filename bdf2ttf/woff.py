@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+from struct import pack_into
+import zlib
+
+
+class WOFFWriter:
+    # wraps the tables of a TTFWriter in WOFF 1.0, each compressed
+    # separately (and only kept compressed if that's smaller).  zlib
+    # releases the GIL, so the tables are compressed in parallel threads
+    # (as many as the executor picks, unless jobs says otherwise)
+    signature = b'wOFF'
+    version = (1, 0)
+
+    def __init__(self, ttf, level=9, jobs=None):
+        self.ttf = ttf
+        self.level = level
+        self.jobs = jobs
+
+    def write(self, file, sfnt=None):
+        # sfnt is the already assembled font, if it was also written as is
+        sfnt = memoryview(sfnt or self.ttf.assemble())
+        tabs = sorted(self.ttf.tables, key=lambda t: t.tag)
+        ntabs = len(tabs)
+
+        def compress(tab):
+            data = sfnt[tab.offset : tab.offset + tab.size]
+            packed = zlib.compress(data, self.level)
+            return packed if len(packed) < tab.size else data
+
+        with ThreadPoolExecutor(self.jobs) as pool:
+            datas = list(pool.map(compress, tabs))
+
+        off = 44 + 20*ntabs
+        offsets = []
+        for data in datas:
+            offsets.append(off)
+            off += len(data) + 3 & ~3
+
+        buf = bytearray(off)
+        pack_into('>4sI I2H I2H 5I', buf, 0,
+            self.signature, self.ttf.TTF_SCALER, off, ntabs, 0,
+            len(sfnt), *self.version, 0, 0, 0, 0, 0)
+
+        for i, (tab, data, offset) in enumerate(zip(tabs, datas, offsets)):
+            pack_into('>4s4I', buf, 44 + 20*i,
+                tab.tag.ljust(4).encode(), offset, len(data), tab.size,
+                tab.chksum)
+            buf[offset : offset + len(data)] = data
+
+        print(f'woff: {len(sfnt)} -> {off} bytes')
+        file.write(buf)